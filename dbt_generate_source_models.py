@@ -28,6 +28,17 @@ Limitations:
     This script won't catch used sources that are not using the source function. e.g. if a downstream model is using a source table directly, this script won't catch it.
 
 Note: This script requires dbt to be installed and configured in your environment.
+With dbt-core 1.5+ the project is parsed once and reused for every table; older
+versions fall back to one dbt CLI call per table.
+
+Set DBT_GEN_CACHE_DIR (e.g. DBT_GEN_CACHE_DIR=.dbt_gen_cache) to cache generated SQL
+on disk between runs. Entries are keyed on the DBT_TARGET environment variable and
+invalidated whenever dbt_project.yml or profiles.yml is modified; entries from older
+versions of either are deleted on the next run that writes to the cache. A target
+chosen any other way (e.g. by editing the default in profiles.yml) is covered by the
+profiles.yml check. The cache does not notice warehouse changes: generate_base_model
+reads the column list from the warehouse, so after a source table's schema changes,
+clear the cache directory (or leave DBT_GEN_CACHE_DIR unset) to pick up the new columns.
 """
 
 import os
@@ -35,15 +46,150 @@ import subprocess
 import sys
 import logging
 import re
-from collections import defaultdict
+import io
+import json
+import mmap
+import hashlib
+import shutil
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache, partial
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    from dbt.cli.main import dbtRunner
+except ImportError:  # dbt-core < 1.5 or dbt only available as a CLI
+    dbtRunner = None
+
+# Number of threads used to scan SQL files
+MAX_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# Matches source('<source_name>', '<table_name>') calls for any source
+ALL_SOURCES_PATTERN = re.compile(
+    rb"source\s*\(\s*['\"]([^'\"]+)['\"]\s*,\s*['\"]([^'\"]+)['\"]\s*\)"
+)
+
+# Directory for caching generated SQL across runs; disabled when unset
+SQL_CACHE_DIR = os.environ.get("DBT_GEN_CACHE_DIR")
+
+# Matches the file names written to SQL_CACHE_DIR, capturing the invalidation prefix
+SQL_CACHE_ENTRY_PATTERN = re.compile(r"^([0-9a-f]{16})-[0-9a-f]{64}\.sqlcache$")
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
 
+@lru_cache(maxsize=32)
+def _get_source_pattern(source_name):
+    """
+    Returns the compiled bytes regex matching source() calls for the given source name.
+
+    The source name is baked into the pattern, so findall() yields bare table names.
+    """
+    return re.compile(
+        rb"source\s*\(\s*['\"]"
+        + re.escape(source_name.encode())
+        + rb"['\"]\s*,\s*['\"]([^'\"]+)['\"]\s*\)"
+    )
+
+
+def _iter_sql_files(path):
+    """
+    Recursively yields the paths of SQL files under the given directory,
+    skipping any directory named 'sources'.
+
+    Uses os.scandir so the file type comes from the cached directory entry
+    instead of an extra stat call per file.
+    """
+    try:
+        entries = os.scandir(path)
+    except OSError as e:
+        # Skip unreadable or missing directories, as os.walk does
+        logging.warning(f"Skipping {path}: {e}")
+        return
+
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name != "sources":
+                    yield from _iter_sql_files(entry.path)
+            elif entry.name.endswith(".sql") and entry.is_file():
+                yield entry.path
+
+
+@contextmanager
+def _open_sql_bytes(file_path):
+    """
+    Yields the contents of a SQL file as bytes, so it can be scanned without being
+    decoded. Large files are memory-mapped; small files are read with a single
+    binary read(), which is cheaper than setting up a mapping.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            yield content
+
+
+def _scan_file_for_source(file_path, source_name):
+    """
+    Returns (table_name, file_path) pairs for each source() call to the given
+    source in a single SQL file.
+
+    Files without a source() call are rejected by a substring check without
+    being decoded.
+    """
+    with _open_sql_bytes(file_path) as content:
+        if content.find(b"source") == -1:
+            return []  # Cheap substring check before running the regex
+        pattern = _get_source_pattern(source_name)
+        return [
+            (table_name.decode(), file_path) for table_name in pattern.findall(content)
+        ]
+
+
+def _scan_file(file_path, prefilter, source_names):
+    """
+    Returns (source_name, table_name, file_path) triples for each source() call
+    in a single SQL file, restricted to source_names unless it is None.
+
+    The full regex only runs on files where the prefilter finds a hit.
+    """
+    with _open_sql_bytes(file_path) as content:
+        if prefilter.search(content) is None:
+            return []
+        return [
+            (source_name.decode(), table_name.decode(), file_path)
+            for source_name, table_name in ALL_SOURCES_PATTERN.findall(content)
+            if source_names is None or source_name in source_names
+        ]
+
+
+def _scan_tree(directory, scan):
+    """
+    Runs scan over every SQL file under the given directory on a thread pool and
+    returns all of the resulting matches in one flat list.
+    """
+    matches = []
+    with ThreadPoolExecutor(max_workers=MAX_SCAN_WORKERS) as executor:
+        for file_matches in executor.map(scan, _iter_sql_files(directory)):
+            matches.extend(file_matches)
+    return matches
+
+
 def get_sources_used_with_source_func(directory, source_name):
     """
     Finds all SQL files in the given directory that use the specified source name
@@ -54,38 +200,223 @@ def get_sources_used_with_source_func(directory, source_name):
         source_name (str): The name of the source to search for.
 
     Returns:
-        dict: A dictionary where keys are source table names and values are sets
-              of file paths that use those source tables.
+        dict: A dictionary where keys are source table names, in sorted order, and
+              values are sets of file paths that use those source tables.
 
     Note:
         This function excludes the 'sources' directory from the search to avoid
-        unnecessary traversal.
+        unnecessary traversal. Files are read and scanned concurrently on a
+        thread pool.
     """
-    used_sources = defaultdict(set)
-    pattern = re.compile(
-        rf"source\s*\(\s*['\"]({re.escape(source_name)})['\"]?\s*,\s*['\"]([^'\"]+)['\"]?\s*\)"
+    matches = _scan_tree(
+        directory, partial(_scan_file_for_source, source_name=source_name)
     )
 
-    for root, dirs, files in os.walk(directory):
-        if "sources" in dirs:
-            dirs.remove("sources")  # Don't traverse into the sources directory
-        for file in files:
-            if file.endswith(".sql"):
-                file_path = os.path.join(root, file)
-                with open(file_path, "r") as f:
-                    content = f.read()
-                    matches = pattern.findall(content)
-                    for match in matches:
-                        if match[0] == source_name:
-                            used_sources[match[1]].add(file_path)
+    # Group once at the end rather than hashing into a dict of sets per match
+    matches.sort(key=itemgetter(0))
+    return {
+        table_name: {file_path for _, file_path in group}
+        for table_name, group in groupby(matches, key=itemgetter(0))
+    }
 
-    return used_sources
 
+def get_all_sources_used(directory, source_names=None):
+    """
+    Finds the source tables used with the source function for several sources in a
+    single pass over the SQL files in the given directory.
+
+    Args:
+        directory (str): The root directory to search for SQL files.
+        source_names (list, optional): Names of the sources to search for. All
+            sources are returned when None.
+
+    Returns:
+        dict: A dictionary where keys are source names and values are dictionaries
+              mapping source table names to sets of file paths that use them.
+              Both levels are in sorted key order.
+
+    Note:
+        This function excludes the 'sources' directory from the search. A single
+        source name is handled by get_sources_used_with_source_func's specialized
+        pattern. Otherwise files are only run through the generic regex if they
+        contain one of the requested source names (or the word 'source' when
+        scanning for all sources).
+    """
+    if source_names is None:
+        prefilter = re.compile(rb"source")
+        wanted = None
+    else:
+        source_names = set(source_names)
+        if not source_names:
+            return {}
+        if len(source_names) == 1:
+            (source_name,) = source_names
+            tables = get_sources_used_with_source_func(directory, source_name)
+            return {source_name: tables} if tables else {}
+        wanted = frozenset(name.encode() for name in source_names)
+        prefilter = re.compile(b"|".join(re.escape(name) for name in wanted))
+
+    matches = _scan_tree(
+        directory, partial(_scan_file, prefilter=prefilter, source_names=wanted)
+    )
 
+    # Group once at the end rather than hashing into a dict of sets per match
+    matches.sort(key=itemgetter(0, 1))
+    return {
+        source_name: {
+            table_name: {file_path for _, _, file_path in table_group}
+            for table_name, table_group in groupby(source_group, key=itemgetter(1))
+        }
+        for source_name, source_group in groupby(matches, key=itemgetter(0))
+    }
+
+
+@lru_cache(maxsize=None)
+def _get_dbt_runner():
+    """
+    Returns a dbtRunner bound to a manifest parsed once for this process, so each
+    run-operation call skips project parsing. Returns None if dbt-core can't be
+    imported as a library or the project fails to parse.
+    """
+    if dbtRunner is None:
+        return None
+
+    parse_result = dbtRunner().invoke(["parse"])
+    if not parse_result.success:
+        logging.warning("dbt parse failed, falling back to the dbt CLI.")
+        return None
+    return dbtRunner(manifest=parse_result.result)
+
+
+def _extract_sql(lines):
+    """
+    Returns the dbt output from the first "with source" onwards, or None if it
+    never appears. Lines before the match are discarded as they are read.
+    """
+    sql_lines = []
+    in_sql = False
+    for line in lines:
+        if not in_sql:
+            start_index = line.find("with source")
+            if start_index == -1:
+                continue
+            in_sql = True
+            line = line[start_index:]
+        sql_lines.append(line)
+
+    return "".join(sql_lines).strip() if in_sql else None
+
+
+def _write_if_changed(file_path, content):
+    """
+    Writes content to file_path unless the file already holds exactly that content.
+
+    The file is written to a temporary file in the same directory and moved into
+    place with os.replace, so readers never see a partially written file. An
+    existing file keeps its permissions, and symlinks are written through rather
+    than replaced.
+
+    Returns:
+        bool: True if the file was written, False if it was already up to date.
+    """
+    file_path = os.path.realpath(file_path)
+    try:
+        with open(file_path, "r") as f:
+            if f.read() == content:
+                return False
+        exists = True
+    except FileNotFoundError:
+        exists = False
+
+    directory, file_name = os.path.split(file_path)
+    tmp_path = os.path.join(directory, f".{file_name}.{os.urandom(4).hex()}.tmp")
+    # Created like open() would, so the kernel applies the umask to new files
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with open(fd, "w") as tmp:
+            tmp.write(content)
+        if exists:
+            shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def _profiles_mtime():
+    """
+    Returns the mtime of the profiles.yml dbt would use (DBT_PROFILES_DIR, then the
+    working directory, then ~/.dbt), or None if there isn't one.
+    """
+    profiles_dirs = [
+        os.environ.get("DBT_PROFILES_DIR"),
+        ".",
+        os.path.join(os.path.expanduser("~"), ".dbt"),
+    ]
+    for profiles_dir in profiles_dirs:
+        if profiles_dir:
+            try:
+                return os.stat(os.path.join(profiles_dir, "profiles.yml")).st_mtime_ns
+            except FileNotFoundError:
+                continue
+    return None
+
+
+def _sql_cache_path(source_name, table_name):
+    """
+    Returns the on-disk cache path for a generated query, or None if disk caching
+    is disabled or there is no dbt_project.yml in the working directory.
+
+    File names are prefixed with a hash of the dbt_project.yml and profiles.yml
+    mtimes so entries from older versions of either can be pruned, and use their
+    own extension so dbt never picks them up as models. The active target
+    (DBT_TARGET) is part of the key, so each target gets its own entries.
+    """
+    if not SQL_CACHE_DIR:
+        return None
+    try:
+        project_mtime = os.stat("dbt_project.yml").st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    prefix = hashlib.sha256(
+        json.dumps([project_mtime, _profiles_mtime()]).encode()
+    ).hexdigest()[:16]
+    key = hashlib.sha256(
+        json.dumps([source_name, table_name, os.environ.get("DBT_TARGET")]).encode()
+    ).hexdigest()
+    return os.path.join(SQL_CACHE_DIR, f"{prefix}-{key}.sqlcache")
+
+
+@lru_cache(maxsize=None)
+def _prune_sql_cache(current_prefix):
+    """
+    Deletes cache entries whose prefix differs from current_prefix. Runs once per
+    process, and only touches files named exactly like a cache entry.
+    """
+    with os.scandir(SQL_CACHE_DIR) as entries:
+        for entry in entries:
+            match = SQL_CACHE_ENTRY_PATTERN.match(entry.name)
+            if (
+                match
+                and match.group(1) != current_prefix
+                and entry.is_file(follow_symlinks=False)
+            ):
+                os.remove(entry.path)
+
+
+@lru_cache(maxsize=None)
 def build_sql_query(source_name, table_name):
     """
     Builds a SQL query for a given source and table using dbt's generate_base_model operation.
 
+    When dbt-core is importable, the operation runs in-process against a shared,
+    already-parsed manifest. Otherwise it falls back to invoking the dbt CLI and
+    streams its stdout line by line rather than buffering all of it.
+
+    Results are memoized per process, and on disk when DBT_GEN_CACHE_DIR is set.
+
     Args:
         source_name (str): The name of the source in the dbt project.
         table_name (str): The name of the table in the specified source.
@@ -93,19 +424,51 @@ def build_sql_query(source_name, table_name):
     Returns:
         str: The generated SQL query, or None if extraction failed.
     """
-    command = f"dbt run-operation generate_base_model --args '{{'source_name': '{source_name}', 'table_name': '{table_name}'}}'"
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-
-    full_output = result.stdout
-    start_index = full_output.find("with source")
-
-    if start_index != -1:
-        return full_output[start_index:].strip()
+    cache_path = _sql_cache_path(source_name, table_name)
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            return f.read()
+
+    operation = [
+        "run-operation",
+        "generate_base_model",
+        "--args",
+        json.dumps({"source_name": source_name, "table_name": table_name}),
+    ]
+
+    runner = _get_dbt_runner()
+    if runner is not None:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            runner.invoke(operation)
+        output.seek(0)
+        sql_query = _extract_sql(output)
     else:
+        try:
+            proc = subprocess.Popen(
+                ["dbt", *operation],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        except FileNotFoundError:
+            logging.error(
+                f"dbt executable not found, could not generate SQL for {table_name}. "
+                "Make sure dbt is installed and on your PATH."
+            )
+            return None
+        with proc:
+            sql_query = _extract_sql(proc.stdout)
+
+    if sql_query is None:
         logging.warning(
             f"Could not extract SQL content for {table_name}. Check the dbt output."
         )
-        return None
+    elif cache_path:
+        os.makedirs(SQL_CACHE_DIR, exist_ok=True)
+        _prune_sql_cache(os.path.basename(cache_path).split("-", 1)[0])
+        _write_if_changed(cache_path, sql_query)
+    return sql_query
 
 
 def generate_source_models_from_yml(yaml_path, source_name):
@@ -120,23 +483,29 @@ def generate_source_models_from_yml(yaml_path, source_name):
         None
     """
     with open(yaml_path, "r") as file:
-        yaml_content = yaml.safe_load(file)
+        yaml_content = yaml.load(file, Loader=_YamlLoader)
+
+    source = next(
+        (s for s in yaml_content["sources"] if s["name"] == source_name), None
+    )
+    if source is None:
+        logging.warning(f"Source {source_name} not found in {yaml_path}.")
+        return
 
     output_dir = os.path.dirname(yaml_path)
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(output_dir or ".", exist_ok=True)
+    output_prefix = os.path.join(output_dir, "")  # Joined once, not per table
 
-    for source in yaml_content["sources"]:
-        if source["name"] == source_name:
-            for table in source["tables"]:
-                table_name = table["name"]
-                file_name = f"source_{source_name}__{table_name}.sql"
-                file_path = os.path.join(output_dir, file_name)
+    for table in source["tables"]:
+        table_name = table["name"]
+        file_path = f"{output_prefix}source_{source_name}__{table_name}.sql"
 
-                sql_query = build_sql_query(source_name, table_name)
-                if sql_query:
-                    with open(file_path, "w") as f:
-                        f.write(sql_query)
-                    logging.info(f"Created {file_path}")
+        sql_query = build_sql_query(source_name, table_name)
+        if sql_query:
+            if _write_if_changed(file_path, sql_query):
+                logging.info(f"Created {file_path}")
+            else:
+                logging.info(f"Unchanged {file_path}")
 
 
 def generate_sql_files_from_used_sources(target_directory, source_name, output_dir):
@@ -153,16 +522,18 @@ def generate_sql_files_from_used_sources(target_directory, source_name, output_d
     """
     used_sources = get_sources_used_with_source_func(target_directory, source_name)
     os.makedirs(output_dir, exist_ok=True)
+    output_prefix = os.path.join(output_dir, "")  # Joined once, not per table
 
-    for table_name in used_sources.keys():
-        file_name = f"source_{source_name}__{table_name}.sql"
-        file_path = os.path.join(output_dir, file_name)
+    # used_sources is keyed in sorted order, so files are written in name order
+    for table_name in used_sources:
+        file_path = f"{output_prefix}source_{source_name}__{table_name}.sql"
 
         sql_query = build_sql_query(source_name, table_name)
         if sql_query:
-            with open(file_path, "w") as f:
-                f.write(sql_query)
-            logging.info(f"Created {file_path}")
+            if _write_if_changed(file_path, sql_query):
+                logging.info(f"Created {file_path}")
+            else:
+                logging.info(f"Unchanged {file_path}")
 
     logging.info(
         f"Generated SQL files for {len(used_sources)} tables used in the project."
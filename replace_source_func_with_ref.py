@@ -14,8 +14,27 @@ and replace all occurrences of the source function with a ref to a model named s
 
 import os
 import re
+import mmap
 import sys
+import shutil
 import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Number of threads used to scan SQL files
+MAX_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# Matches the opening of a Jinja source() call
+SOURCE_PATTERN = re.compile(rb"{{\s*source\s*\(")
+
+# Matches a full {{ source('<source_name>', '<table_name>') }} expression
+SOURCE_CALL_PATTERN = re.compile(
+    rb"{{\s*source\s*\(\s*(?:\"?\'?([^\"\']+)\"?\'?\s*,\s*\"?\'?([^\"\']+)\"?\'?)\s*\)\s*}}"
+)
 
 
 def setup_logging():
@@ -28,58 +47,156 @@ def setup_logging():
     )
 
 
+def _iter_sql_files(path):
+    """
+    Recursively yields the paths of all SQL files under the given directory.
+
+    Args:
+        path (str): The root directory to search for SQL files.
+
+    Yields:
+        str: The path of each SQL file found.
+    """
+    try:
+        entries = os.scandir(path)
+    except OSError as e:
+        # Skip unreadable or missing directories, as os.walk does
+        logging.warning(f"Skipping {path}: {e}")
+        return
+
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_sql_files(entry.path)
+            elif entry.name.endswith(".sql") and entry.is_file():
+                yield entry.path
+
+
+@contextmanager
+def _open_sql_bytes(file_path):
+    """
+    Yields the contents of a SQL file as bytes, so it can be scanned without being
+    decoded. Large files are memory-mapped; small files are read with a single
+    binary read(), which is cheaper than setting up a mapping.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            yield content
+
+
+def _read_if_source_ref(file_path):
+    """
+    Returns the contents of the given SQL file as bytes if it uses the source
+    function, otherwise None.
+    """
+    with _open_sql_bytes(file_path) as content:
+        # Cheap substring checks before running the regex
+        if content.find(b"{{") == -1 or content.find(b"source") == -1:
+            return None
+        if SOURCE_PATTERN.search(content) is None:
+            return None
+        return bytes(content)
+
+
 def find_files_with_source_refs(project_dir):
     """
     Finds all SQL files in the given project directory that use the source function.
 
+    Files are read once and yielded with their contents, so they can be passed
+    straight to replace_sources_with_refs without being read again.
+
     Args:
         project_dir (str): The root directory to search for SQL files.
 
-    Returns:
-        list: A list of file paths that use the source function.
+    Yields:
+        tuple: The path and contents (bytes) of each file that uses the source function.
     """
-    source_pattern = re.compile(r"{{\s*source\s*\(")
-    files_with_sources = []
+    for file_path in _iter_sql_files(project_dir):
+        content = _read_if_source_ref(file_path)
+        if content is not None:
+            yield file_path, content
 
-    for root, _, files in os.walk(project_dir):
-        for file in files:
-            if file.endswith(".sql"):
-                file_path = os.path.join(root, file)
-                with open(file_path, "r") as f:
-                    content = f.read()
-                if source_pattern.search(content):
-                    files_with_sources.append(file_path)
 
-    return files_with_sources
+def _source_call_to_ref(match):
+    """
+    Returns the ref() expression replacing a matched source() expression.
+    """
+    return b"{{ ref('source_" + match.group(1) + b"__" + match.group(2) + b"') }}"
 
 
-def replace_sources_with_refs(file_path):
+def _write_atomic(file_path, content):
+    """
+    Replaces the file's content via a temporary file in the same directory, so
+    readers never see a partially written file. The file's permissions are kept,
+    and symlinks are written through rather than replaced.
+    """
+    file_path = os.path.realpath(file_path)
+    tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(file_path), delete=False)
+    try:
+        with tmp:
+            tmp.write(content)
+        shutil.copymode(file_path, tmp.name)
+        os.replace(tmp.name, file_path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+
+
+def replace_sources_with_refs(file_path, content=None):
     """
     Replaces all occurrences of the source function with a ref to a model named source_<source_name>__<table_name>
-    in the given file path.
+    in the given file path. The file is left untouched if there is nothing to replace.
 
     Args:
         file_path (str): The path to the SQL file to be processed.
-    """
-    with open(file_path, "r") as f:
-        content = f.read()
+        content (bytes, optional): The file's contents, if already read.
 
-    matches = re.finditer(
-        r"{{\s*source\s*\(\s*(?:\"?\'?([^\"\']+)\"?\'?\s*,\s*\"?\'?([^\"\']+)\"?\'?)\s*\)\s*}}",
-        content,
-        re.DOTALL,
-    )
-    if matches:
-        for match in matches:
-            source_name = match.group(1)
-            table_name = match.group(2)
-            new_ref = f"{{{{ ref('source_{source_name}__{table_name}') }}}}"
-            content = content.replace(match.group(0), new_ref)
+    Returns:
+        bool: True if the file was rewritten.
+    """
+    if content is None:
+        with _open_sql_bytes(file_path) as content:
+            content = bytes(content)
 
-    with open(file_path, "w") as f:
-        f.write(content)
+    content, replacements = SOURCE_CALL_PATTERN.subn(_source_call_to_ref, content)
+    if replacements == 0:
+        return False
 
+    _write_atomic(file_path, content)
     logging.info(f"Processed: {file_path}")
+    return True
+
+
+def _process_file(file_path):
+    """
+    Reads a SQL file once and rewrites it if it uses the source function.
+
+    Returns:
+        bool: True if the file was rewritten.
+    """
+    content = _read_if_source_ref(file_path)
+    return content is not None and replace_sources_with_refs(file_path, content)
+
+
+def process_tree(project_dir):
+    """
+    Replaces source() calls with refs in every SQL file under the given project
+    directory, in a single pass that reads each file only once.
+
+    This is equivalent to calling replace_sources_with_refs on each file yielded by
+    find_files_with_source_refs, but spreads the files over a thread pool.
+
+    Args:
+        project_dir (str): The root directory to search for SQL files.
+
+    Returns:
+        int: The number of files that were rewritten.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_SCAN_WORKERS) as executor:
+        return sum(executor.map(_process_file, _iter_sql_files(project_dir)))
 
 
 if __name__ == "__main__":
@@ -87,9 +204,6 @@ if __name__ == "__main__":
 
     project_directory = sys.argv[1] if len(sys.argv) > 1 else "./models/marts"
 
-    files_to_process = find_files_with_source_refs(project_directory)
-
-    for file_path in files_to_process:
-        replace_sources_with_refs(file_path)
+    processed_count = process_tree(project_directory)
 
-    logging.info(f"Processed {len(files_to_process)} files with source references.")
+    logging.info(f"Processed {processed_count} files with source references.")